@@ -0,0 +1,45 @@
+"""
+Shared pytest configuration for the integration tests
+"""
+
+import os
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+_TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJ_ROOT = os.path.normpath(os.path.join(_TESTS_DIR, "..", ".."))
+
+# Import roots for the integration tests, resolved once at collection:
+# project root, firmware sources, and the MCP unified deployment server
+# (sibling checkout or ~/mcp) when present
+_IMPORT_PATHS = [
+    _PROJ_ROOT,
+    os.path.join(_PROJ_ROOT, "src"),
+]
+for _mcp_path in (
+    os.path.join(_PROJ_ROOT, "..", "mcp", "servers", "python", "unified_deployment"),
+    os.path.expanduser("~/mcp/servers/python/unified_deployment"),
+):
+    if os.path.isdir(_mcp_path):
+        _IMPORT_PATHS.append(os.path.normpath(_mcp_path))
+
+for _path in reversed(_IMPORT_PATHS):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "tcp: test talks to an emulator over a real TCP socket")
+
+
+# Embedded-only modules that host-side tests import indirectly
+_EMBEDDED_MODULES = ("freertos", "esp_task_wdt", "esp_heap_caps")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_embedded_modules():
+    """Install host-side mocks for embedded-specific modules once per session."""
+    for name in _EMBEDDED_MODULES:
+        sys.modules.setdefault(name, Mock())
+    yield
@@ -13,17 +13,10 @@ import time
 import requests
 import socket
 import json
-import os
-import sys
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
-# Add project root to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
-
-# Add MCP server path
-mcp_path = os.path.join(os.path.dirname(__file__), '../../../mcp/servers/python/unified_deployment')
-sys.path.insert(0, mcp_path)
+# Project root and MCP server import paths are set up in conftest.py
 
 
 class DockerIntegrationTest:
@@ -10,13 +10,10 @@ import time
 import unittest
 from unittest.mock import Mock, MagicMock
 
-# Add src to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
-
-# Mock the embedded-specific imports for testing on host
-sys.modules['freertos'] = Mock()
-sys.modules['esp_task_wdt'] = Mock()
-sys.modules['esp_heap_caps'] = Mock()
+# src/ is put on sys.path by conftest.py
+# Embedded-specific modules (freertos, esp_task_wdt, esp_heap_caps) are
+# mocked once per session by the mock_embedded_modules fixture in conftest.py;
+# the __main__ block below does the same when run without pytest
 
 class TestSafetyIntegration(unittest.TestCase):
     """Test safety system integration"""
@@ -150,4 +147,10 @@ class TestSafetyIntegration(unittest.TestCase):
             self.skipTest(f"PowerManager not available in test environment: {e}")
 
 if __name__ == '__main__':
+    # conftest.py only runs under pytest, so repeat its setup here
+    _src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+    if _src not in sys.path:
+        sys.path.insert(0, _src)
+    for _name in ('freertos', 'esp_task_wdt', 'esp_heap_caps'):
+        sys.modules.setdefault(_name, Mock())
     unittest.main()
\ No newline at end of file
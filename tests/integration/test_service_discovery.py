@@ -4,105 +4,357 @@ Test Service Discovery Concepts
 Validates automatic device detection mechanisms for modular ESP32 BPM system
 """
 
+import ctypes
+import errno
+import itertools
+import os
+import select
 import socket
-import json
+import sys
 import time
 import threading
-import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Announcements are encoded to and decoded from bytes directly
+try:
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    import json
+    from json import loads as _json_loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+# Datagrams pulled per recvmmsg(2) call, and the receive buffer size of each
+_RECV_BATCH = 64
+_RECV_BUFSIZE = 4096
+# Service ids only need to be unique within a test run, so a process-wide
+# counter (shared by every instance) replaces uuid4's getrandom() call
+_service_ids = itertools.count()
+
+# Most announcements flushed per sendmmsg(2) call
+_SEND_BATCH = 100
+# Socket buffer sizes requested so announcement bursts are not dropped
+_RCVBUF_SIZE = 4 * 1024 * 1024
+_SNDBUF_SIZE = 1 * 1024 * 1024
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort), ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_ubyte * 4), ("sin_zero", ctypes.c_ubyte * 8)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IOVec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+def _bind_libc(name: str, *argtypes):
+    """Bind a Linux libc socket call through ctypes, or None where unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        func = getattr(ctypes.CDLL(None, use_errno=True), name)
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = argtypes
+    func.restype = ctypes.c_int
+    return func
+
+_recvmmsg = _bind_libc("recvmmsg", ctypes.c_int, ctypes.POINTER(_MMsgHdr),
+                       ctypes.c_uint, ctypes.c_int, ctypes.c_void_p)
+_sendmmsg = _bind_libc("sendmmsg", ctypes.c_int, ctypes.POINTER(_MMsgHdr),
+                       ctypes.c_uint, ctypes.c_int)
 
 class MockServiceDiscovery:
     """Mock service discovery implementation"""
     
-    def __init__(self, multicast_group: str = "239.0.0.1", port: int = 5353):
+    def __init__(self, multicast_group: str = "239.0.0.1", port: int = 5353,
+                 interface: Optional[str] = None, device: Optional[str] = None,
+                 loop: bool = False):
         self.multicast_group = multicast_group
         self.port = port
+        # Local IPv4 address to send and join on, and (Linux) the device to bind
+        # to; pinning both skips the kernel's per-packet interface selection
+        self.interface = interface
+        self.device = device
+        # Whether announcements sent by this instance are delivered to other
+        # sockets on the same host; only needed when a local peer listens.
+        # Traffic sent out of the loopback device reaches the host either way.
+        self.loop = loop
         self.sock = None
+        self.send_sock = None
         self.services: Dict[str, Dict] = {}
+        # Encoded announcement per service id, reused by retransmit()
+        self._serialized_cache: Dict[str, bytes] = {}
         self.running = False
+        # Preallocated recvmmsg/sendmmsg vectors, set up by start() on Linux
+        self._recv_msgs = None
+        self._send_msgs = None
         
     def start(self):
         """Start service discovery"""
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
-        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
-        
         try:
+            # Receive socket: bound to the discovery port and joined to the group
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Give each instance bound to the port its own receive queue where supported
+            if hasattr(socket, "SO_REUSEPORT"):
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self._bind_device(self.sock)
+            self._set_buffer_size(self.sock, socket.SO_RCVBUF, _RCVBUF_SIZE, "net.core.rmem_max")
+
+            # Send socket: connected to the group so announcements go out with a
+            # plain send(). It is separate because a connected UDP socket only
+            # receives from its peer, which would filter out other devices.
+            self.send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            self.send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            self.send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, int(self.loop))
+            if self.interface:
+                self.send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+            self._bind_device(self.send_sock)
+            self._set_buffer_size(self.send_sock, socket.SO_SNDBUF, _SNDBUF_SIZE, "net.core.wmem_max")
             self.sock.bind(("", self.port))
             self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, 
-                               socket.inet_aton(self.multicast_group) + socket.inet_aton("0.0.0.0"))
+                               socket.inet_aton(self.multicast_group) + socket.inet_aton(self.interface or "0.0.0.0"))
+            self.send_sock.connect((self.multicast_group, self.port))
+            if _recvmmsg is not None:
+                self._alloc_recv_batch()
+            if _sendmmsg is not None:
+                self._alloc_send_batch()
             self.running = True
             print(f"✅ Service discovery started on {self.multicast_group}:{self.port}")
             return True
         except Exception as e:
+            # Device binding, interface and bind errors all land here; close
+            # whatever was opened so a failed start leaks no sockets
             print(f"❌ Failed to start service discovery: {e}")
+            self._close_sockets()
             return False
     
+    def __enter__(self):
+        """Start discovery for a with block, raising if the socket cannot be set up"""
+        if not self.start():
+            self.stop()
+            raise OSError(f"Failed to start service discovery on {self.multicast_group}:{self.port}")
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop discovery when the with block exits"""
+        self.stop()
+
+    def _bind_device(self, sock: socket.socket):
+        """Bind a socket to self.device where SO_BINDTODEVICE is supported"""
+        if self.device and hasattr(socket, "SO_BINDTODEVICE"):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, self.device.encode())
+            except PermissionError as e:
+                # Older kernels require CAP_NET_RAW; IP_MULTICAST_IF still pins egress
+                print(f"⚠️ Could not bind to device {self.device}: {e}")
+
+    def _set_buffer_size(self, sock: socket.socket, option: int, size: int, limit_sysctl: str):
+        """Request a socket buffer size and warn if the kernel clamps it"""
+        sock.setsockopt(socket.SOL_SOCKET, option, size)
+        actual = sock.getsockopt(socket.SOL_SOCKET, option)
+        # Linux reports double the granted size to account for bookkeeping
+        if sys.platform.startswith("linux"):
+            actual //= 2
+        if actual < size:
+            print(f"⚠️ Socket buffer is {actual} bytes, below requested {size} (check {limit_sysctl})")
+    
     def stop(self):
         """Stop service discovery"""
         self.running = False
+        self._close_sockets()
+        print("✅ Service discovery stopped")
+
+    def _close_sockets(self):
+        """Close the receive and send sockets if they are open"""
         if self.sock:
             self.sock.close()
             self.sock = None
-        print("✅ Service discovery stopped")
+        if self.send_sock:
+            self.send_sock.close()
+            self.send_sock = None
     
-    def advertise_service(self, service_info: Dict):
-        """Advertise a service"""
-        service_id = str(uuid.uuid4())
+    def _alloc_recv_batch(self):
+        """Allocate the recvmmsg buffers, addresses and headers once per socket"""
+        self._recv_bufs = [ctypes.create_string_buffer(_RECV_BUFSIZE) for _ in range(_RECV_BATCH)]
+        self._recv_addrs = (_SockAddrIn * _RECV_BATCH)()
+        self._recv_iovs = (_IOVec * _RECV_BATCH)()
+        self._recv_msgs = (_MMsgHdr * _RECV_BATCH)()
+        for i in range(_RECV_BATCH):
+            self._recv_iovs[i].iov_base = ctypes.addressof(self._recv_bufs[i])
+            self._recv_iovs[i].iov_len = _RECV_BUFSIZE
+            hdr = self._recv_msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._recv_addrs[i])
+            hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+            hdr.msg_iov = ctypes.pointer(self._recv_iovs[i])
+            hdr.msg_iovlen = 1
+
+    def _recv_batch(self, wait: float) -> List[Tuple[bytes, Tuple[str, int]]]:
+        """Receive pending datagrams, up to _RECV_BATCH per syscall where recvmmsg exists"""
+        if self._recv_msgs is None:
+            self.sock.settimeout(wait)
+            try:
+                return [self.sock.recvfrom(_RECV_BUFSIZE)]
+            except socket.timeout:
+                return []
+
+        # Wait for the first datagram, then drain whatever is queued in one call
+        if not select.select([self.sock], [], [], wait)[0]:
+            return []
+        count = _recvmmsg(self.sock.fileno(), self._recv_msgs, _RECV_BATCH,
+                          socket.MSG_DONTWAIT, None)
+        if count < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+
+        packets = []
+        for i in range(count):
+            msg = self._recv_msgs[i]
+            addr = self._recv_addrs[i]
+            packets.append((ctypes.string_at(self._recv_bufs[i], msg.msg_len),
+                            (socket.inet_ntoa(bytes(addr.sin_addr)), socket.ntohs(addr.sin_port))))
+            # The kernel overwrites msg_namelen on receive
+            msg.msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+        return packets
+
+    def _prepare_announcement(self, service_info: Dict):
+        """Register a service locally and return its id and encoded announcement"""
+        service_id = f'{os.getpid():x}-{next(_service_ids):x}'
         service_info["service_id"] = service_id
-        service_info["timestamp"] = int(time.time() * 1000)
+        service_info["timestamp"] = time.time_ns() // 1_000_000
         
         self.services[service_id] = service_info
         
-        # Send multicast announcement
         message = {
             "type": "service_announcement",
             "service": service_info
         }
-        
+        data = _json_dumps(message)
+        self._serialized_cache[service_id] = data
+        return service_id, data
+
+    def advertise_service(self, service_info: Dict):
+        """Advertise a service"""
         try:
-            data = json.dumps(message).encode('utf-8')
-            self.sock.sendto(data, (self.multicast_group, self.port))
+            service_id, data = self._prepare_announcement(service_info)
+            # Send multicast announcement
+            self.send_sock.send(data)
             print(f"✅ Advertised service: {service_info['name']} ({service_id})")
             return service_id
         except Exception as e:
             print(f"❌ Failed to advertise service: {e}")
             return None
+
+    def retransmit(self, service_id: str) -> bool:
+        """Resend a previously advertised service without re-encoding it"""
+        data = self._serialized_cache.get(service_id)
+        if data is None:
+            print(f"❌ Cannot retransmit unknown service: {service_id}")
+            return False
+        try:
+            self.send_sock.send(data)
+            return True
+        except Exception as e:
+            print(f"❌ Failed to retransmit service: {e}")
+            return False
+
+    def advertise_services_batch(self, services: List[Dict]) -> List[str]:
+        """Advertise several services, flushing up to _SEND_BATCH announcements per syscall
+
+        Uses sendmmsg(2) where available and falls back to one send() per
+        service elsewhere. Paced re-advertisement should keep using
+        advertise_service, since a batch leaves the socket all at once.
+        """
+        try:
+            prepared = [self._prepare_announcement(info) for info in services]
+            payloads = [data for _, data in prepared]
+            if self._send_msgs is None:
+                for data in payloads:
+                    self.send_sock.send(data)
+            else:
+                for start in range(0, len(payloads), _SEND_BATCH):
+                    self._send_batch(payloads[start:start + _SEND_BATCH])
+            print(f"✅ Advertised {len(prepared)} service(s) in batch")
+            return [service_id for service_id, _ in prepared]
+        except Exception as e:
+            print(f"❌ Failed to advertise services: {e}")
+            return []
+
+    def _alloc_send_batch(self):
+        """Allocate the sendmmsg headers once; the connected send socket supplies the address"""
+        self._send_iovs = (_IOVec * _SEND_BATCH)()
+        self._send_msgs = (_MMsgHdr * _SEND_BATCH)()
+        for i in range(_SEND_BATCH):
+            hdr = self._send_msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self._send_iovs[i])
+            hdr.msg_iovlen = 1
+
+    def _send_batch(self, payloads: List[bytes]):
+        """Send up to _SEND_BATCH payloads to the multicast group through sendmmsg calls"""
+        # Point the iovecs straight at the payload bytes; the caller's list
+        # keeps them alive for the duration of the call, so nothing is copied
+        for iov, data in zip(self._send_iovs, payloads):
+            iov.iov_base = ctypes.cast(data, ctypes.c_void_p).value
+            iov.iov_len = len(data)
+
+        # sendmmsg may stop short of vlen; resume from the first unsent message
+        count = len(payloads)
+        sent = 0
+        while sent < count:
+            n = _sendmmsg(self.send_sock.fileno(), ctypes.pointer(self._send_msgs[sent]), count - sent, 0)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                raise OSError(err, os.strerror(err))
+            sent += n
     
     def discover_services(self, timeout: float = 2.0) -> List[Dict]:
         """Discover available services"""
         discovered = []
+        # Service ids already collected, for O(1) dedup of repeated announcements
+        seen_ids = set()
         start_time = time.time()
         
         while time.time() - start_time < timeout:
             try:
-                self.sock.settimeout(0.1)
-                data, addr = self.sock.recvfrom(4096)
-                message = json.loads(data.decode('utf-8'))
-                
-                if message.get("type") == "service_announcement":
-                    service = message["service"]
-                    if service not in discovered:
-                        discovered.append(service)
-                        print(f"✅ Discovered service: {service['name']} at {addr[0]}:{service.get('port', 'N/A')}")
-                        
-            except socket.timeout:
-                continue
+                for data, addr in self._recv_batch(0.1):
+                    message = _json_loads(data)
+
+                    if message.get("type") == "service_announcement":
+                        service = message["service"]
+                        service_id = service.get("service_id")
+                        if service_id and service_id not in seen_ids:
+                            seen_ids.add(service_id)
+                            discovered.append(service)
+                            print(f"✅ Discovered service: {service['name']} at {addr[0]}:{service.get('port', 'N/A')}")
+
             except Exception as e:
                 print(f"❌ Discovery error: {e}")
                 break
         
         return discovered
 
+# Tests where one local instance must hear another keep their traffic on
+# loopback, which delivers back to the host whatever IP_MULTICAST_LOOP says.
+# Advertise-only tests use the default interface with loop disabled, so their
+# own announcements are not queued back to them.
+_TEST_INTERFACE = "127.0.0.1"
+_TEST_DEVICE = "lo"
+
 def test_esp32_service_advertisement():
     """Test ESP32 device advertisement"""
-    discovery = MockServiceDiscovery()
-    
-    if not discovery.start():
-        return False, "Failed to start discovery service"
-    
-    try:
+    with MockServiceDiscovery() as discovery:
         # Advertise ESP32 BPM detector service
         esp32_service = {
             "name": "ESP32 BPM Detector",
@@ -133,21 +385,19 @@ def test_esp32_service_advertisement():
         if not all(field in registered_service for field in required_fields):
             return False, "Service registration missing required fields"
         
+        # Periodic re-advertisement reuses the cached announcement
+        if not discovery.retransmit(service_id):
+            return False, "Failed to retransmit ESP32 service"
+        
         print("✅ ESP32 service advertisement: Successfully registered")
         return True, "ESP32 service advertisement successful"
-        
-    finally:
-        discovery.stop()
 
 def test_client_service_discovery():
     """Test client discovery of ESP32 services"""
-    discovery1 = MockServiceDiscovery()
-    discovery2 = MockServiceDiscovery()
-    
-    if not discovery1.start() or not discovery2.start():
-        return False, "Failed to start discovery services"
-    
-    try:
+    # Both instances share the host. Loopback delivers locally on its own;
+    # loop=True keeps this working if the tests are pointed at a real interface.
+    with MockServiceDiscovery(interface=_TEST_INTERFACE, device=_TEST_DEVICE, loop=True) as discovery1, \
+         MockServiceDiscovery(interface=_TEST_INTERFACE, device=_TEST_DEVICE, loop=True) as discovery2:
         # Advertise service from discovery1
         esp32_service = {
             "name": "ESP32 BPM Detector #1",
@@ -185,19 +435,59 @@ def test_client_service_discovery():
         
         print("✅ Client service discovery: Successfully discovered ESP32 service")
         return True, f"Discovered {len(discovered_services)} service(s)"
+
+def test_batch_service_advertisement():
+    """Test advertising several services in one batch"""
+    # Sender and listener share the host, so pin both to loopback (see above)
+    with MockServiceDiscovery(interface=_TEST_INTERFACE, device=_TEST_DEVICE, loop=True) as discovery, \
+         MockServiceDiscovery(interface=_TEST_INTERFACE, device=_TEST_DEVICE) as listener:
+        # More than one sendmmsg call's worth, so the batch is split
+        services = [
+            {"name": f"ESP32 BPM Detector #{i}", "type": "bpm_detector", "port": 80}
+            for i in range(1, _SEND_BATCH + 21)
+        ]
         
-    finally:
-        discovery1.stop()
-        discovery2.stop()
+        service_ids = discovery.advertise_services_batch(services)
+        if len(service_ids) != len(services):
+            return False, "Failed to advertise service batch"
+        
+        # Verify every service was registered locally
+        if not all(service_id in discovery.services for service_id in service_ids):
+            return False, "Batched services not registered locally"
+        
+        # Verify every announcement actually went out on the wire
+        discovered_ids = {service["service_id"] for service in listener.discover_services(timeout=1.0)}
+        missing = set(service_ids) - discovered_ids
+        if missing:
+            return False, f"{len(missing)} batched services not discovered"
+        
+        print("✅ Batch service advertisement: All services registered and discovered")
+        return True, f"Advertised and discovered {len(service_ids)} services in batch"
 
-def test_service_metadata_exchange():
-    """Test detailed service metadata exchange"""
-    discovery = MockServiceDiscovery()
+def test_multicast_loop_flag():
+    """Test that disabling IP_MULTICAST_LOOP stops local delivery"""
+    # Uses the default interface: loopback would deliver regardless of the flag
+    received = {}
+    for loop in (True, False):
+        with MockServiceDiscovery(loop=loop) as sender, MockServiceDiscovery() as listener:
+            if not sender.advertise_service({"name": f"Loop {loop}", "type": "bpm_detector", "port": 80}):
+                return False, "Failed to advertise service"
+            received[loop] = bool(listener.discover_services(timeout=0.5))
     
-    if not discovery.start():
-        return False, "Failed to start discovery service"
+    if not received[True]:
+        # Without a multicast route nothing arrives, so the flag cannot be observed
+        print("⚠️ Multicast loop flag: no local delivery on the default interface, skipped")
+        return True, "Skipped: no multicast delivery on the default interface"
     
-    try:
+    if received[False]:
+        return False, "Announcement delivered locally with loop disabled"
+    
+    print("✅ Multicast loop flag: Local delivery follows IP_MULTICAST_LOOP")
+    return True, "Loop flag controls local delivery"
+
+def test_service_metadata_exchange():
+    """Test detailed service metadata exchange"""
+    with MockServiceDiscovery() as discovery:
         # Advertise comprehensive service metadata
         detailed_service = {
             "name": "ESP32 BPM Detector Pro",
@@ -270,9 +560,6 @@ def test_service_metadata_exchange():
         
         print("✅ Service metadata exchange: Comprehensive service information validated")
         return True, "Service metadata exchange successful"
-        
-    finally:
-        discovery.stop()
 
 def main():
     """Run all service discovery tests"""
@@ -282,13 +569,18 @@ def main():
     tests = [
         ("ESP32 Service Advertisement", test_esp32_service_advertisement),
         ("Client Service Discovery", test_client_service_discovery),
+        ("Batch Service Advertisement", test_batch_service_advertisement),
+        ("Multicast Loop Flag", test_multicast_loop_flag),
         ("Service Metadata Exchange", test_service_metadata_exchange)
     ]
     
     results = []
     for test_name, test_func in tests:
         print(f"\nRunning: {test_name}")
-        success, message = test_func()
+        try:
+            success, message = test_func()
+        except Exception as e:
+            success, message = False, str(e)
         results.append((test_name, success, message))
         status = "✅ PASSED" if success else "❌ FAILED"
         print(f"{status}: {message}")
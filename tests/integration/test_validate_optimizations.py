@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Tests for the config.h define tokenizer in validate_optimizations.py
+"""
+
+import validate_optimizations
+
+def test_define_parsing_valueless_define():
+    """A valueless define must not swallow the following line"""
+    content = "#define CONFIG_H\n#define FFT_SIZE 512\n"
+    defines = dict(validate_optimizations._DEFINE_RE.findall(content))
+    assert defines == {'FFT_SIZE': '512'}
+
+def test_define_parsing_trailing_comment():
+    """Only the first token after the name is taken as the value"""
+    content = "  #define USE_DC_BLOCKING_FILTER 1   // DC blocker\n#define FFT_SIZE 5120\n"
+    defines = dict(validate_optimizations._DEFINE_RE.findall(content))
+    assert defines['USE_DC_BLOCKING_FILTER'] == '1'
+    assert defines['FFT_SIZE'] != '512'
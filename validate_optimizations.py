@@ -6,28 +6,105 @@ This script validates that the optimization changes compile correctly and
 provides basic functionality testing.
 """
 
+import io
 import os
+import re
 import sys
 import subprocess
 import tempfile
+import threading
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
-def check_compilation():
+# Optional: match every marker in one pass with an Aho-Corasick automaton
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Sources the validators inspect; each is read once by main() and shared
+_REQUIRED_FILES = [
+    'src/bpm_detector.cpp',
+    'src/bpm_detector.h',
+    'src/audio_input.cpp',
+    'src/audio_input.h',
+    'src/config.h'
+]
+
+# RAM-backed scratch directory for the compile probe source, when available
+_SCRATCH_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# "#define NAME VALUE" lines in config headers; VALUE is the first token only.
+# Separators are spaces/tabs only so a valueless define never takes the next line.
+_DEFINE_RE = re.compile(r'^[ \t]*#define[ \t]+(\w+)[ \t]+(\S+)', re.MULTILINE)
+
+# Validators run concurrently; each thread's prints are buffered and
+# replayed in order so the report reads the same as a sequential run
+_thread_output = threading.local()
+
+class _ThreadStdout:
+    """sys.stdout proxy that sends prints from validator threads to their own buffer"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        return getattr(_thread_output, 'buffer', self._stream).write(text)
+
+    def flush(self):
+        getattr(_thread_output, 'buffer', self._stream).flush()
+
+def _run_buffered(validator, *args):
+    """Run a validator, returning its result and everything it printed"""
+    _thread_output.buffer = io.StringIO()
+    try:
+        return validator(*args), _thread_output.buffer.getvalue()
+    finally:
+        del _thread_output.buffer
+
+@lru_cache(maxsize=None)
+def _marker_automaton(markers):
+    """Build (once per marker set) an automaton that reports every marker it sees"""
+    automaton = ahocorasick.Automaton()
+    for marker in markers:
+        # latin-1 maps bytes 1:1 onto code points, so matches stay exact
+        automaton.add_word(marker.decode('latin-1'), marker)
+    automaton.make_automaton()
+    return automaton
+
+def _read_sources(paths):
+    """Read each existing source file once, returning {path: bytes}"""
+    sources = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sources[path] = f.read()
+    return sources
+
+def _source(sources, path):
+    """Look up a file from the shared read, failing like open() when it is missing"""
+    try:
+        return sources[path]
+    except KeyError:
+        raise FileNotFoundError(f"No such file: '{path}'") from None
+
+def _scan_source(data, markers):
+    """Evaluate (check name, byte marker) pairs against a source file's bytes"""
+    if ahocorasick is not None:
+        automaton = _marker_automaton(tuple(marker for _, marker in markers))
+        hits = {marker for _, marker in automaton.iter(data.decode('latin-1'))}
+        return [(name, marker in hits) for name, marker in markers]
+    return [(name, marker in data) for name, marker in markers]
+
+def check_compilation(sources):
     """Check if the optimized code compiles without errors"""
     print("🔍 Checking compilation of optimized audio processing code...")
 
     # Check if required files exist
-    required_files = [
-        'src/bpm_detector.cpp',
-        'src/bpm_detector.h',
-        'src/audio_input.cpp',
-        'src/audio_input.h',
-        'src/config.h'
-    ]
-
-    for file in required_files:
-        if not os.path.exists(file):
+    for file in _REQUIRED_FILES:
+        if file not in sources:
             print(f"❌ Required file missing: {file}")
             return False
         print(f"✅ Found: {file}")
@@ -59,22 +136,21 @@ int main() {
 
     try:
         # Write test code to temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.cpp', delete=False) as f:
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.cpp', delete=False, dir=_SCRATCH_DIR) as f:
             f.write(test_code)
             test_file = f.name
 
-        # Try to compile (this will fail due to missing ESP32 dependencies, but should catch syntax errors)
+        # Try to compile (this will fail due to missing ESP32 dependencies, but should catch syntax errors).
+        # Only parsing and semantic analysis are needed, so no object file is generated.
         cmd = [
-            'g++', '-std=c++17', '-I.', '-I./include', '-c', test_file,
-            '-o', '/tmp/test_compile.o', '-DESP32'  # Define ESP32 for conditional compilation
+            'g++', '-std=c++17', '-fsyntax-only', '-I.', '-I./include', test_file,
+            '-DESP32'  # Define ESP32 for conditional compilation
         ]
 
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
 
         # Clean up
         os.unlink(test_file)
-        if os.path.exists('/tmp/test_compile.o'):
-            os.unlink('/tmp/test_compile.o')
 
         if result.returncode == 0:
             print("✅ Compilation test passed")
@@ -89,25 +165,27 @@ int main() {
         print(f"❌ Compilation test error: {e}")
         return False
 
-def validate_config():
+def validate_config(sources):
     """Validate configuration settings"""
     print("\n🔧 Validating configuration settings...")
 
     try:
-        # Read config.h and extract key defines
-        with open('src/config.h', 'r') as f:
-            config_content = f.read()
+        # Extract key defines from config.h
+        config_content = _source(sources, 'src/config.h').decode('utf-8', errors='replace')
+
+        # Tokenize every #define once, then check exact values
+        defines = dict(_DEFINE_RE.findall(config_content))
 
         # Check for required optimizations
         checks = {
-            'FFT_SIZE reduced to 512': 'FFT_SIZE 512' in config_content,
-            'Spectral BPM validation enabled': 'USE_SPECTRAL_BPM_VALIDATION 1' in config_content,
-            'Enhanced beat detection enabled': 'USE_ENHANCED_BEAT_DETECTION 1' in config_content,
-            'DC blocking filter enabled': 'USE_DC_BLOCKING_FILTER 1' in config_content,
-            'Bass band-pass filter enabled': 'USE_BASS_BAND_PASS_FILTER 1' in config_content,
-            'Performance monitoring enabled': 'ENABLE_PERFORMANCE_MONITORING 1' in config_content,
-            'FFT pre-allocation enabled': 'FFT_PREALLOCATE_BUFFERS 1' in config_content,
-            'Blackman-Harris window': 'FFT_WIN_TYP_BLACKMAN_HARRIS' in config_content
+            'FFT_SIZE reduced to 512': defines.get('FFT_SIZE') == '512',
+            'Spectral BPM validation enabled': defines.get('USE_SPECTRAL_BPM_VALIDATION') == '1',
+            'Enhanced beat detection enabled': defines.get('USE_ENHANCED_BEAT_DETECTION') == '1',
+            'DC blocking filter enabled': defines.get('USE_DC_BLOCKING_FILTER') == '1',
+            'Bass band-pass filter enabled': defines.get('USE_BASS_BAND_PASS_FILTER') == '1',
+            'Performance monitoring enabled': defines.get('ENABLE_PERFORMANCE_MONITORING') == '1',
+            'FFT pre-allocation enabled': defines.get('FFT_PREALLOCATE_BUFFERS') == '1',
+            'Blackman-Harris window': 'FFT_WIN_TYP_BLACKMAN_HARRIS' in defines.values()
         }
 
         all_passed = True
@@ -123,7 +201,7 @@ def validate_config():
         print(f"❌ Config validation error: {e}")
         return False
 
-def validate_implementation():
+def validate_implementation(sources):
     """Validate that optimizations are properly implemented"""
     print("\n🔨 Validating optimization implementations...")
 
@@ -131,33 +209,27 @@ def validate_implementation():
 
     # Check audio_input.cpp for filter implementations
     try:
-        with open('src/audio_input.cpp', 'r') as f:
-            audio_input_content = f.read()
-
-        checks.extend([
-            ('DC blocker filter implemented', 'DCBlocker::process' in audio_input_content),
-            ('High-pass filter implemented', 'HighPassFilter::process' in audio_input_content),
-            ('Bass band-pass filter implemented', 'BassBandPassFilter::process' in audio_input_content),
-            ('ADC calibration used', 'esp_adc_cal_raw_to_voltage' in audio_input_content),
-            ('Filter conditional compilation', '#if USE_DC_BLOCKING_FILTER' in audio_input_content)
-        ])
+        checks.extend(_scan_source(_source(sources, 'src/audio_input.cpp'), [
+            ('DC blocker filter implemented', b'DCBlocker::process'),
+            ('High-pass filter implemented', b'HighPassFilter::process'),
+            ('Bass band-pass filter implemented', b'BassBandPassFilter::process'),
+            ('ADC calibration used', b'esp_adc_cal_raw_to_voltage'),
+            ('Filter conditional compilation', b'#if USE_DC_BLOCKING_FILTER')
+        ]))
     except Exception as e:
         print(f"❌ Error reading audio_input.cpp: {e}")
         return False
 
     # Check bpm_detector.cpp for spectral and enhanced beat detection
     try:
-        with open('src/bpm_detector.cpp', 'r') as f:
-            bpm_detector_content = f.read()
-
-        checks.extend([
-            ('Spectral BPM estimation implemented', 'estimateBPMFromSpectrum' in bpm_detector_content),
-            ('Hybrid BPM calculation implemented', 'calculateHybridBPM' in bpm_detector_content),
-            ('Enhanced beat detection implemented', 'detectBeatAdvanced' in bpm_detector_content),
-            ('Adaptive debounce implemented', 'calculateAdaptiveDebounce' in bpm_detector_content),
-            ('Performance monitoring implemented', 'fft_compute_time_us_' in bpm_detector_content),
-            ('Multi-criteria beat validation', 'MULTI_CRITERIA_BEAT_VALIDATION' in bpm_detector_content)
-        ])
+        checks.extend(_scan_source(_source(sources, 'src/bpm_detector.cpp'), [
+            ('Spectral BPM estimation implemented', b'estimateBPMFromSpectrum'),
+            ('Hybrid BPM calculation implemented', b'calculateHybridBPM'),
+            ('Enhanced beat detection implemented', b'detectBeatAdvanced'),
+            ('Adaptive debounce implemented', b'calculateAdaptiveDebounce'),
+            ('Performance monitoring implemented', b'fft_compute_time_us_'),
+            ('Multi-criteria beat validation', b'MULTI_CRITERIA_BEAT_VALIDATION')
+        ]))
     except Exception as e:
         print(f"❌ Error reading bpm_detector.cpp: {e}")
         return False
@@ -208,12 +280,28 @@ def main():
     print("🚀 ESP32 BPM Detector - Audio Processing Optimizations Validation")
     print("=" * 65)
 
+    validators = [
+        ("Configuration Validation", validate_config),
+        ("Implementation Validation", validate_implementation),
+        ("Compilation Check", check_compilation),
+    ]
     results = []
+    sources = _read_sources(_REQUIRED_FILES)
 
-    # Run validation checks
-    results.append(("Configuration Validation", validate_config()))
-    results.append(("Implementation Validation", validate_implementation()))
-    results.append(("Compilation Check", check_compilation()))
+    # Run validation checks concurrently; the g++ run in check_compilation
+    # dominates, so wall time is roughly that of the slowest check
+    stdout = sys.stdout
+    sys.stdout = _ThreadStdout(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=len(validators)) as executor:
+            futures = [(name, executor.submit(_run_buffered, validator, sources))
+                       for name, validator in validators]
+            for name, future in futures:
+                passed, output = future.result()
+                stdout.write(output)
+                results.append((name, passed))
+    finally:
+        sys.stdout = stdout
 
     # Summary
     print("\n" + "=" * 65)